@@ -0,0 +1,76 @@
+"""
+FastAPI/ASGI variant of the stroke model service
+Run this service: uvicorn asgi_service:app --host 0.0.0.0 --port 5000 --workers 4
+
+Same endpoints and response bodies as model_service.py, but served over
+ASGI: JSON parsing, CORS and socket handling stay on the event loop
+while the blocking TF call runs in a threadpool (the GIL is released
+inside TF's C++ kernels), so I/O overlaps with compute under concurrent
+load instead of blocking a whole WSGI worker per request.
+"""
+import logging
+
+from fastapi import FastAPI, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+import model_service
+
+logger = logging.getLogger('stroke')
+
+app = FastAPI(default_response_class=ORJSONResponse)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=['*'],
+    allow_methods=['*'],
+    allow_headers=['*']
+)
+
+
+class PredictRequest(BaseModel):
+    features: dict
+
+
+@app.get('/health')
+async def health():
+    """Health check endpoint"""
+    return {
+        'status': 'healthy',
+        'model_loaded': model_service.MODEL_LOADED,
+        'model_path': model_service.active_model_path()
+    }
+
+
+@app.post('/predict')
+async def predict(req: PredictRequest, debug: int = 0):
+    """Prediction endpoint; same body as the Flask service"""
+    if not model_service.MODEL_LOADED:
+        raise HTTPException(status_code=500, detail='Model not loaded')
+    # Same error contract as the Flask handler: encoding failures are a
+    # fixed 400, everything else a fixed 500 with the traceback logged
+    # once - never the stringified exception in the response body
+    try:
+        return await run_in_threadpool(
+            model_service.predict_risk, req.features, debug == 1)
+    except model_service.FeatureEncodingError as e:
+        logger.warning("Bad /predict input: %s", e)
+        raise HTTPException(status_code=400,
+                            detail='Features could not be encoded')
+    except Exception:
+        logger.exception("Prediction failed")
+        raise HTTPException(status_code=500,
+                            detail='Internal error during inference')
+
+
+@app.get('/model/info')
+async def model_info():
+    """Get model information"""
+    if not model_service.MODEL_LOADED:
+        raise HTTPException(status_code=500, detail='Model not loaded')
+    return {
+        'model_path': model_service.active_model_path(),
+        'expected_features': model_service.FEATURE_NAMES,
+        'feature_count': len(model_service.FEATURE_NAMES)
+    }
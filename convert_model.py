@@ -0,0 +1,222 @@
+"""
+One-time conversion of stroke_model.h5 to a quantized TFLite model
+Run this script: STROKE_QUANT_MODE=int8 python convert_model.py
+
+Supported modes (STROKE_QUANT_MODE; defaults to int8, or dynamic when
+sample-data.csv is not available for calibration):
+  int8    - full INT8 quantization (weights and activations), smallest
+            and fastest; emits stroke_model.tflite
+  dynamic - dynamic-range / weight-only quantization: int8 weights with
+            float32 activations and hybrid int8 GEMM kernels at runtime.
+            Needs no calibration data and has minimal accuracy impact;
+            emits stroke_model_dynamic.tflite
+  int16x8 - int8 weights with int16 activations, which preserves the
+            small softmax probability deltas the risk calibration relies
+            on; emits stroke_model_int16x8.tflite (float32 input/output
+            since int16 I/O is not universally supported)
+  onnx    - FP32 export for ONNX Runtime via tf2onnx (opset 17); emits
+            stroke.onnx, served through onnxruntime's CPU execution
+            provider which fuses Dense+Bias+ReLU and calls MLAS GEMM
+            directly
+  savedmodel - FP32 re-save as a SavedModel with the optimizer state
+            stripped; emits stroke_savedmodel/, which loads faster and
+            uses less memory per worker than the HDF5 file
+  fuse    - fold BatchNormalization layers into the preceding Dense
+            kernels (same numerics, fewer ops per inference - the fusion
+            the TFLite converter does, applied to the Keras graph so the
+            FP32 fallback benefits too); emits stroke_model_fused.h5
+
+The quantized modes are calibrated with a representative dataset built
+from sample-data.csv. model_service.py selects the artifact via the same
+STROKE_QUANT_MODE variable and falls back to the FP32 .h5 model when the
+artifact is missing (or when STROKE_QUANT_MODE=fp32).
+"""
+import csv
+import os
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+from model_service import preprocess_features
+
+MODEL_PATH = 'stroke_model.h5'
+TFLITE_PATHS = {
+    'int8': 'stroke_model.tflite',
+    'int16x8': 'stroke_model_int16x8.tflite',
+    'dynamic': 'stroke_model_dynamic.tflite'
+}
+ONNX_PATH = 'stroke.onnx'
+SAVEDMODEL_PATH = 'stroke_savedmodel'
+FUSED_PATH = 'stroke_model_fused.h5'
+SAMPLE_DATA_PATH = 'sample-data.csv'
+
+
+def coerce_row(row):
+    """Convert numeric CSV strings to numbers before preprocessing.
+
+    csv.DictReader yields everything as strings, and the binary-flag
+    encoder treats any non-empty string as truthy - so hypertension='0'
+    would encode as 1.0. Production traffic arrives from the Node proxy
+    with these fields already numeric, so calibration should see the
+    same.
+    """
+    coerced = {}
+    for key, value in row.items():
+        try:
+            coerced[key] = float(value)
+        except (TypeError, ValueError):
+            coerced[key] = value
+    return coerced
+
+
+def representative_dataset():
+    """Yield calibration samples for the quantizer.
+
+    Uses real patient rows from sample-data.csv run through the same
+    preprocessing as the /predict endpoint, so the observed activation
+    ranges match production traffic. Falls back to random vectors when
+    the CSV is missing.
+    """
+    if os.path.exists(SAMPLE_DATA_PATH):
+        with open(SAMPLE_DATA_PATH, newline='') as f:
+            for row in csv.DictReader(f):
+                yield [preprocess_features(coerce_row(row))]
+    else:
+        print(f"⚠ {SAMPLE_DATA_PATH} not found, calibrating with random data")
+        rng = np.random.default_rng(42)
+        for _ in range(100):
+            yield [rng.random((1, 22), dtype=np.float32)]
+
+
+def export_onnx(model):
+    import tf2onnx
+
+    spec = (tf.TensorSpec([None, 22], tf.float32, name='input'),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=17,
+                               output_path=ONNX_PATH)
+
+    original_size = os.path.getsize(MODEL_PATH)
+    onnx_size = os.path.getsize(ONNX_PATH)
+    print(f"✓ Wrote {ONNX_PATH} (opset 17)")
+    print(f"  Original: {original_size / 1024:.1f} KB")
+    print(f"  ONNX:     {onnx_size / 1024:.1f} KB")
+    return True
+
+
+def export_savedmodel(model):
+    model.save(SAVEDMODEL_PATH, include_optimizer=False, save_format='tf')
+    print(f"✓ Wrote {SAVEDMODEL_PATH}/ (optimizer state stripped)")
+    return True
+
+
+def fuse_batchnorm(model):
+    """Fold each BatchNormalization into the Dense layer before it.
+
+    W' = W * gamma / sqrt(var + eps)
+    b' = (b - mean) * gamma / sqrt(var + eps) + beta
+
+    Only Sequential models with linear-activation Dense layers directly
+    followed by BatchNormalization are fused; anything else is kept
+    as-is.
+    """
+    layers = model.layers
+    new_model = keras.Sequential(name=model.name + '_fused')
+    new_model.add(keras.Input(shape=model.input_shape[1:]))
+
+    fused = 0
+    i = 0
+    while i < len(layers):
+        layer = layers[i]
+        nxt = layers[i + 1] if i + 1 < len(layers) else None
+        if (isinstance(layer, keras.layers.Dense)
+                and layer.activation is keras.activations.linear
+                and isinstance(nxt, keras.layers.BatchNormalization)
+                and nxt.scale and nxt.center):
+            gamma, beta, mean, var = nxt.get_weights()
+            if layer.use_bias:
+                w, b = layer.get_weights()
+            else:
+                w, = layer.get_weights()
+                b = np.zeros(layer.units, dtype=w.dtype)
+            inv = gamma / np.sqrt(var + nxt.epsilon)
+            new_dense = keras.layers.Dense(layer.units, name=layer.name + '_fused')
+            new_model.add(new_dense)
+            new_dense.set_weights([w * inv, (b - mean) * inv + beta])
+            fused += 1
+            i += 2
+        else:
+            clone = layer.__class__.from_config(layer.get_config())
+            new_model.add(clone)
+            clone.set_weights(layer.get_weights())
+            i += 1
+
+    if fused == 0:
+        print("⚠ No Dense+BatchNormalization pairs found, nothing to fuse")
+        return False
+    new_model.save(FUSED_PATH, include_optimizer=False)
+    print(f"✓ Wrote {FUSED_PATH} ({fused} BatchNorm layer(s) folded)")
+    return True
+
+
+def convert(quant_mode):
+    if quant_mode not in TFLITE_PATHS and quant_mode not in ('onnx', 'savedmodel', 'fuse'):
+        print(f"✗ Unknown STROKE_QUANT_MODE '{quant_mode}' "
+              f"(expected one of: {', '.join(TFLITE_PATHS)}, onnx, savedmodel, fuse)")
+        return False
+    if not os.path.exists(MODEL_PATH):
+        print(f"✗ Model file not found at {MODEL_PATH}")
+        return False
+
+    model = keras.models.load_model(MODEL_PATH)
+    print(f"✓ Loaded {MODEL_PATH}")
+    print(f"Model input shape: {model.input_shape}")
+    print(f"Model output shape: {model.output_shape}")
+
+    if quant_mode == 'onnx':
+        return export_onnx(model)
+    if quant_mode == 'savedmodel':
+        return export_savedmodel(model)
+    if quant_mode == 'fuse':
+        return fuse_batchnorm(model)
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quant_mode == 'dynamic':
+        # No representative dataset: weights go int8, activations stay
+        # float32, and Dense ops run hybrid int8 GEMM kernels
+        pass
+    elif quant_mode == 'int16x8':
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [
+            tf.lite.OpsSet.EXPERIMENTAL_TFLITE_BUILTINS_ACTIVATIONS_INT16_WEIGHTS_INT8
+        ]
+        # int16 input/output is not universally supported; keep float32 I/O
+    else:
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+
+    tflite_path = TFLITE_PATHS[quant_mode]
+    tflite_model = converter.convert()
+    with open(tflite_path, 'wb') as f:
+        f.write(tflite_model)
+
+    original_size = os.path.getsize(MODEL_PATH)
+    quantized_size = os.path.getsize(tflite_path)
+    print(f"✓ Wrote {tflite_path} ({quant_mode})")
+    print(f"  Original:  {original_size / 1024:.1f} KB")
+    print(f"  Quantized: {quantized_size / 1024:.1f} KB "
+          f"({original_size / quantized_size:.1f}x smaller)")
+    return True
+
+
+if __name__ == '__main__':
+    default_mode = 'int8' if os.path.exists(SAMPLE_DATA_PATH) else 'dynamic'
+    mode = os.environ.get('STROKE_QUANT_MODE', default_mode)
+    print("=" * 60)
+    print(f"🔧 Stroke Model TFLite Conversion ({mode})")
+    print("=" * 60)
+    if not convert(mode):
+        print("\n✗ Conversion failed. Please ensure stroke_model.h5 exists.")
@@ -3,25 +3,171 @@ Flask service to load and serve predictions from stroke_model.h5
 Run this service: python model_service.py
 """
 from flask import Flask, request, jsonify
-from flask_cors import CORS
+import cachetools
 import numpy as np
+import orjson
 import tensorflow as tf
 from tensorflow import keras
+import logging
 import os
+import queue
+import threading
+import time
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 
 app = Flask(__name__)
-CORS(app)
+# Flask sorts response keys by default; skip that work per response
+app.json.sort_keys = False
+
+# The frontend origin is known (the Node server), so set static CORS
+# headers in one after_request instead of Flask-CORS's per-response
+# Python origin matching. Flask answers OPTIONS preflights automatically
+# and this hook decorates those responses too.
+ALLOWED_ORIGIN = os.environ.get('STROKE_ALLOWED_ORIGIN', 'http://localhost:3001')
+
+@app.after_request
+def add_cors_headers(response):
+    response.headers['Access-Control-Allow-Origin'] = ALLOWED_ORIGIN
+    response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
+    response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+    return response
+
+# Request-path diagnostics go through logging at DEBUG so production runs
+# (INFO) skip the NumPy-to-string formatting and stdout writes entirely;
+# per-request print() calls serialize concurrent requests under load.
+logger = logging.getLogger('stroke')
 
 # Load the trained model
+# Prefer the quantized TFLite model (see convert_model.py) and fall back
+# to the FP32 .h5 model when the .tflite artifact is missing.
+# STROKE_QUANT_MODE selects the backend so operators can A/B calibration
+# drift between quantized and FP32 outputs before rollout:
+#   int8    - full INT8 quantization (stroke_model.tflite)
+#   int16x8 - int16 activations / int8 weights (stroke_model_int16x8.tflite)
+#   dynamic - int8 weights / float32 activations, needs no calibration
+#             (stroke_model_dynamic.tflite)
+#   fp32    - skip TFLite and ONNX entirely and serve the Keras model
+#             (the reference output for A/B comparisons)
+# When unset, the calibrated full-int8 artifact is preferred and the
+# calibration-free dynamic-range one is used if that's all that shipped.
 MODEL_PATH = 'stroke_model.h5'
+FUSED_MODEL_PATH = 'stroke_model_fused.h5'
+SAVEDMODEL_PATH = 'stroke_savedmodel'
+ONNX_PATH = 'stroke.onnx'
+_TFLITE_ARTIFACTS = {
+    'int8': 'stroke_model.tflite',
+    'int16x8': 'stroke_model_int16x8.tflite',
+    'dynamic': 'stroke_model_dynamic.tflite'
+}
+QUANT_MODE = os.environ.get('STROKE_QUANT_MODE')
+if QUANT_MODE is None:
+    TFLITE_PATH = (_TFLITE_ARTIFACTS['int8']
+                   if os.path.exists(_TFLITE_ARTIFACTS['int8'])
+                   else _TFLITE_ARTIFACTS['dynamic'])
+else:
+    TFLITE_PATH = _TFLITE_ARTIFACTS.get(QUANT_MODE)
 model = None
+predict_fn = None
+interpreter = None
+input_details = None
+output_details = None
+onnx_session = None
+onnx_input_name = None
+keras_model_path = None
+
+# Threads per TF call. Defaults to 1 because production runs N gunicorn
+# workers (see below) and per-worker thread pools would oversubscribe the
+# CPU; raise it when running a single process.
+NUM_THREADS = int(os.environ.get('STROKE_NUM_THREADS', 1))
+
+def warmup(runs=1):
+    """Run dummy inferences so the first real request doesn't pay
+    one-time costs (graph tracing, kernel/primitive instantiation,
+    weight caching, Numba compilation of the postprocess) - typically
+    100-500ms on the first call."""
+    dummy = np.zeros((1, 22), dtype=np.float32)
+    for _ in range(runs):
+        postprocess_prediction(run_inference(dummy))
 
 def load_model():
-    global model
-    if os.path.exists(MODEL_PATH):
+    global model, predict_fn, interpreter, input_details, output_details
+    global onnx_session, onnx_input_name, keras_model_path
+    tf.config.threading.set_intra_op_parallelism_threads(NUM_THREADS)
+    tf.config.threading.set_inter_op_parallelism_threads(NUM_THREADS)
+    if TFLITE_PATH is not None and os.path.exists(TFLITE_PATH):
         try:
-            model = keras.models.load_model(MODEL_PATH)
-            print(f"✓ Model loaded successfully from {MODEL_PATH}")
+            interpreter = tf.lite.Interpreter(
+                model_path=TFLITE_PATH,
+                num_threads=NUM_THREADS
+            )
+            interpreter.allocate_tensors()
+            input_details = interpreter.get_input_details()[0]
+            output_details = interpreter.get_output_details()[0]
+            warmup()
+            print(f"✓ TFLite model loaded successfully from {TFLITE_PATH}")
+            print(f"Model input shape: {input_details['shape']}")
+            print(f"Model output shape: {output_details['shape']}")
+            return True
+        except Exception as e:
+            print(f"✗ Error loading TFLite model: {e}")
+            print("  Falling back to FP32 model...")
+            interpreter = None
+    # Next preference: the FP32 ONNX export (see convert_model.py).
+    # ONNX Runtime's CPU execution provider fuses Dense+Bias+ReLU at
+    # load time and calls MLAS GEMM directly, skipping TF's Python
+    # dispatch entirely. Skipped in fp32 mode, which exists to serve the
+    # reference Keras output for A/B comparisons.
+    if QUANT_MODE != 'fp32' and ort is not None and os.path.exists(ONNX_PATH):
+        try:
+            so = ort.SessionOptions()
+            so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            so.intra_op_num_threads = NUM_THREADS
+            onnx_session = ort.InferenceSession(
+                ONNX_PATH, sess_options=so,
+                providers=['CPUExecutionProvider'])
+            onnx_input_name = onnx_session.get_inputs()[0].name
+            warmup()
+            print(f"✓ ONNX model loaded successfully from {ONNX_PATH}")
+            print(f"Model input shape: {onnx_session.get_inputs()[0].shape}")
+            print(f"Model output shape: {onnx_session.get_outputs()[0].shape}")
+            return True
+        except Exception as e:
+            print(f"✗ Error loading ONNX model: {e}")
+            print("  Falling back to FP32 model...")
+            onnx_session = None
+    # FP32 Keras fallback: prefer the BatchNorm-fused model, then the
+    # optimizer-stripped SavedModel (protobuf + variables load faster
+    # and carry less state than HDF5), then the original .h5;
+    # compile=False skips optimizer/loss reconstruction either way.
+    if os.path.exists(FUSED_MODEL_PATH):
+        keras_model_path = FUSED_MODEL_PATH
+    elif os.path.isdir(SAVEDMODEL_PATH):
+        keras_model_path = SAVEDMODEL_PATH
+    else:
+        keras_model_path = MODEL_PATH
+    if os.path.exists(keras_model_path):
+        try:
+            model = keras.models.load_model(keras_model_path, compile=False)
+            # Trace a concrete function once at startup instead of going
+            # through model.predict per request: that re-enters Keras's
+            # PredictFunction wrapper, builds an iterator and Python-side
+            # batching state on every call, which dwarfs the actual matmul
+            # for a single 1x22 vector.
+            predict_fn = tf.function(
+                lambda x: model(x, training=False),
+                input_signature=[tf.TensorSpec([None, 22], tf.float32)]
+            ).get_concrete_function()
+            warmup(runs=3)
+            print(f"✓ Model loaded successfully from {keras_model_path}")
             print(f"Model input shape: {model.input_shape}")
             print(f"Model output shape: {model.output_shape}")
             return True
@@ -32,6 +178,153 @@ def load_model():
         print(f"✗ Model file not found at {MODEL_PATH}")
         return False
 
+# Reused between inferences so quantizing the input doesn't allocate a
+# fresh array per request; reallocated only when the batch shape changes.
+# Safe without a lock because all inference runs on the batch worker
+# thread (and gunicorn sync workers are single-threaded anyway).
+_quant_scratch = None
+
+# UIs re-submit identical feature dicts (form tweaks, retries), so cache
+# postprocessed results keyed on the canonicalized feature vector and
+# serve repeats with a dict lookup instead of an inference call. The
+# lock is cheap: nothing in the critical section releases the GIL.
+_prediction_cache = cachetools.LRUCache(maxsize=4096)
+_cache_lock = threading.Lock()
+
+def run_inference(input_data):
+    """Run an Nx22 batch through whichever backend is loaded.
+
+    Callers must serialize access (the batch worker thread is the only
+    serving-time caller, or the direct path's lock when batching is
+    disabled), since the TFLite interpreter is not thread-safe.
+    """
+    if interpreter is not None:
+        global input_details, output_details, _quant_scratch
+        # Quantize the float32 input to the interpreter's integer domain,
+        # run the integer kernels, then dequantize the output.
+        if input_details['shape'][0] != input_data.shape[0]:
+            interpreter.resize_tensor_input(
+                input_details['index'], list(input_data.shape))
+            interpreter.allocate_tensors()
+            input_details = interpreter.get_input_details()[0]
+            output_details = interpreter.get_output_details()[0]
+        scale, zero_point = input_details['quantization']
+        # Write straight into the interpreter's input buffer (the
+        # tensor() view is re-acquired each call: it is invalidated by
+        # allocate_tensors) rather than paying set_tensor's copy.
+        input_view = interpreter.tensor(input_details['index'])()
+        if scale:
+            if (_quant_scratch is None
+                    or _quant_scratch.shape != input_data.shape):
+                _quant_scratch = np.empty(input_data.shape, dtype=np.float32)
+            np.divide(input_data, scale, out=_quant_scratch)
+            _quant_scratch += zero_point
+            np.round(_quant_scratch, out=_quant_scratch)
+            # Saturate to the integer domain: the float->int assignment
+            # below wraps out-of-range values, so inputs outside the
+            # calibration range would otherwise flip sign instead of
+            # clamping to the extremes
+            info = np.iinfo(input_details['dtype'])
+            np.clip(_quant_scratch, info.min, info.max, out=_quant_scratch)
+            input_view[...] = _quant_scratch
+        else:
+            input_view[...] = input_data
+        del input_view
+        interpreter.invoke()
+        output = interpreter.get_tensor(output_details['index'])
+        out_scale, out_zero_point = output_details['quantization']
+        if out_scale:
+            output = (output.astype(np.float32) - out_zero_point) * out_scale
+        return output
+    if onnx_session is not None:
+        return onnx_session.run(None, {onnx_input_name: input_data})[0]
+    return predict_fn(tf.constant(input_data)).numpy()
+
+def active_model_path():
+    """Path of the artifact currently serving predictions"""
+    if interpreter is not None:
+        return TFLITE_PATH
+    if onnx_session is not None:
+        return ONNX_PATH
+    return keras_model_path or MODEL_PATH
+
+# Micro-batching: a 1x22 inference is dominated by framework launch
+# overhead, so concurrent requests are queued, concatenated into one
+# Nx22 batch (up to MAX_BATCH rows or MAX_WAIT_MS of waiting) and run as
+# a single model call whose results fan back out to the waiting handlers.
+MAX_BATCH = 32
+MAX_WAIT_MS = float(os.environ.get('STROKE_BATCH_WAIT_MS', 5))
+_BATCH_TIMEOUT_S = 5.0
+
+class _PendingPrediction:
+    __slots__ = ('input', 'event', 'result', 'error')
+
+    def __init__(self, input_data):
+        self.input = input_data
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+_batch_queue = queue.Queue()
+_batch_thread = None
+_batch_thread_lock = threading.Lock()
+_direct_inference_lock = threading.Lock()
+
+def _batch_worker():
+    while True:
+        items = [_batch_queue.get()]
+        deadline = time.monotonic() + MAX_WAIT_MS / 1000.0
+        while len(items) < MAX_BATCH:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                items.append(_batch_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        try:
+            batch = items[0].input if len(items) == 1 else np.vstack(
+                [item.input for item in items])
+            outputs = run_inference(batch)
+            for item, row in zip(items, outputs):
+                item.result = row.reshape(1, -1)
+        except Exception as e:
+            for item in items:
+                item.error = e
+        for item in items:
+            item.event.set()
+
+def _ensure_batch_worker():
+    # Started lazily on first use so each gunicorn worker gets its own
+    # consumer thread after fork() (threads do not survive forking).
+    global _batch_thread
+    if _batch_thread is not None and _batch_thread.is_alive():
+        return
+    with _batch_thread_lock:
+        if _batch_thread is None or not _batch_thread.is_alive():
+            _batch_thread = threading.Thread(
+                target=_batch_worker, name='batch-inference', daemon=True)
+            _batch_thread.start()
+
+def batched_inference(input_data):
+    """Enqueue one 1x22 input and block until its batch has run"""
+    # Single-threaded workers (gunicorn -k sync) can never have a
+    # companion request in flight, so waiting out the batch window only
+    # adds latency there; STROKE_BATCH_WAIT_MS=0 skips the queue and
+    # runs inference directly (serialized, since threaded servers may
+    # also run with batching disabled).
+    if MAX_WAIT_MS <= 0:
+        with _direct_inference_lock:
+            return run_inference(input_data)
+    _ensure_batch_worker()
+    item = _PendingPrediction(input_data)
+    _batch_queue.put(item)
+    if not item.event.wait(_BATCH_TIMEOUT_S):
+        raise TimeoutError('inference timed out waiting for batch worker')
+    if item.error is not None:
+        raise item.error
+    return item.result
+
 # Feature names expected by the model (adjust based on your training)
 # Your model expects 22 features based on the input shape
 FEATURE_NAMES = [
@@ -51,102 +344,218 @@ FEATURE_NAMES = [
     'feature_21', 'feature_22'
 ]
 
+# Encoding maps for the categorical features, built once at import time so
+# the per-request path is plain dict lookups with no branching or list
+# allocation (this runs on every request before inference).
+_WORK_TYPE_MAP = {
+    'private': 0.0,
+    'self-employed': 1.0,
+    'govt_job': 2.0,
+    'children': 3.0,
+    'never_worked': 4.0
+}
+_GENDER_MAP = {'male': 1.0, 'female': 0.0, 'other': 2.0}
+_SMOKING_MAP = {
+    'never smoked': 0.0,
+    'never': 0.0,
+    'formerly smoked': 1.0,
+    'formerly': 1.0,
+    'smokes': 2.0,
+    'regularly smoked': 2.0,
+    'current': 2.0,
+    'unknown': 3.0
+}
+
+# Per-field encoders; each takes the raw value (string, bool or number)
+# and returns the float the model expects. Keeping them as tiny
+# module-level functions lets preprocess_features run one flat loop over
+# a static dispatch table instead of a cascade of isinstance branches,
+# and freezes the field list for future codegen.
+def _enc_float(v):
+    return float(v)
+
+def _enc_bool01(v):
+    return 1.0 if v else 0.0
+
+def _enc_married(v):
+    if isinstance(v, str):
+        return 1.0 if v.lower() in ('yes', 'married') else 0.0
+    return float(v)
+
+def _enc_work(v):
+    if isinstance(v, str):
+        return _WORK_TYPE_MAP.get(v.lower(), 0.0)
+    return float(v)
+
+def _enc_residence(v):
+    if isinstance(v, str):
+        return 1.0 if v.lower() == 'urban' else 0.0
+    return float(v)
+
+def _enc_gender(v):
+    if isinstance(v, str):
+        return _GENDER_MAP.get(v.lower(), 0.0)
+    return float(v)
+
+def _enc_smoking(v):
+    if isinstance(v, str):
+        return _SMOKING_MAP.get(v.lower(), 3.0)
+    return float(v)
+
+# (key, default, encoder) per input index; order matches the model's
+# first 10 features
+_FIELDS = (
+    ('age', 50, _enc_float),
+    ('hypertension', 0, _enc_bool01),
+    ('heart_disease', 0, _enc_bool01),
+    ('ever_married', 1, _enc_married),
+    ('work_type', 0, _enc_work),
+    ('Residence_type', 1, _enc_residence),
+    ('avg_glucose_level', 100, _enc_float),
+    ('bmi', 25, _enc_float),
+    ('gender', 0, _enc_gender),
+    ('smoking_status', 0, _enc_smoking)
+)
+
+class FeatureEncodingError(ValueError):
+    """Raised when a feature dict cannot be encoded into model input.
+
+    Distinguishes client errors (bad feature values) from backend
+    failures that happen to raise the same builtin exception types, so
+    the handlers can map them to 400 vs 500 correctly.
+    """
+
+# Zeroed 1x22 template: indices 10-21 are the additional features the
+# model was trained with, which default to 0 (adjust if your training
+# data included other vitals or encoded variables there).
+_TEMPLATE = np.zeros((1, 22), dtype=np.float32)
+
 def preprocess_features(features):
     """
     Convert FHIR features to model input format
-    Adjust this based on how you trained your model
     Your model expects 22 features - we'll pad with defaults for missing ones
+    Categorical encodings:
+      work_type: 0=Private, 1=Self-employed, 2=Govt_job, 3=children, 4=Never_worked
+      gender: 1=Male, 0=Female, 2=Other
+      smoking_status: 0=never, 1=formerly, 2=smokes, 3=Unknown
     """
-    # Initialize feature vector with 22 zeros
-    feature_vector = [0.0] * 22
-    
-    # Age (index 0)
-    feature_vector[0] = float(features.get('age', 50))
-    
-    # Hypertension (index 1) - binary: 0 or 1
-    hypertension = features.get('hypertension', 0)
-    feature_vector[1] = float(1 if hypertension else 0)
-    
-    # Heart disease (index 2) - binary: 0 or 1
-    heart_disease = features.get('heart_disease', 0)
-    feature_vector[2] = float(1 if heart_disease else 0)
-    
-    # Ever married (index 3) - binary: 1=Yes, 0=No
-    ever_married = features.get('ever_married', 1)
-    if isinstance(ever_married, str):
-        ever_married = 1 if ever_married.lower() in ['yes', 'married'] else 0
-    feature_vector[3] = float(ever_married)
-    
-    # Work type (index 4) - encoded: 0=Private, 1=Self-employed, 2=Govt_job, 3=children, 4=Never_worked
-    work_type = features.get('work_type', 0)
-    if isinstance(work_type, str):
-        work_type_map = {
-            'private': 0,
-            'self-employed': 1,
-            'govt_job': 2,
-            'children': 3,
-            'never_worked': 4
-        }
-        work_type = work_type_map.get(work_type.lower(), 0)
-    feature_vector[4] = float(work_type)
-    
-    # Residence type (index 5) - binary: 1=Urban, 0=Rural
-    residence = features.get('Residence_type', 1)
-    if isinstance(residence, str):
-        residence = 1 if residence.lower() == 'urban' else 0
-    feature_vector[5] = float(residence)
-    
-    # Average glucose level (index 6)
-    feature_vector[6] = float(features.get('avg_glucose_level', 100))
-    
-    # BMI (index 7)
-    feature_vector[7] = float(features.get('bmi', 25))
-    
-    # Gender (index 8) - binary: 1=Male, 0=Female, 2=Other
-    gender = features.get('gender', 0)
-    if isinstance(gender, str):
-        gender_map = {'male': 1, 'female': 0, 'other': 2}
-        gender = gender_map.get(gender.lower(), 0)
-    feature_vector[8] = float(gender)
-    
-    # Smoking status (index 9) - encoded: 0=never, 1=formerly, 2=smokes, 3=Unknown
-    smoking = features.get('smoking_status', 0)
-    if isinstance(smoking, str):
-        smoking_map = {
-            'never smoked': 0,
-            'never': 0,
-            'formerly smoked': 1,
-            'formerly': 1,
-            'smokes': 2,
-            'regularly smoked': 2,
-            'current': 2,
-            'unknown': 3
+    out = _TEMPLATE.copy()
+    row = out[0]
+    get = features.get
+    for i, (key, default, encode) in enumerate(_FIELDS):
+        row[i] = encode(get(key, default))
+    return out
+
+def json_response(body, status=200):
+    """Serialize a response with orjson (~5x faster than stdlib json for
+    numeric payloads, and serializes NumPy arrays without .tolist())"""
+    return app.response_class(
+        orjson.dumps(body, option=orjson.OPT_SERIALIZE_NUMPY),
+        status=status,
+        mimetype='application/json'
+    )
+
+# Risk lookup tables for postprocessing, indexed by predicted class
+# (classes 0-4 represent risk levels from lowest to highest; adjust
+# based on your training). Parallel arrays instead of a per-request dict
+# of tuples keep the hot postprocess to plain array indexing.
+_RISK_LEVELS = ('very_low', 'low', 'moderate', 'high', 'very_high')
+_BASE_PROBS = np.array([0.1, 0.3, 0.5, 0.7, 0.9], dtype=np.float32)
+# Binary output: < 0.4 low, < 0.7 moderate, otherwise high
+_BINARY_THRESHOLDS = np.array([0.4, 0.7], dtype=np.float32)
+_BINARY_LEVELS = ('low', 'moderate', 'high')
+
+if njit is not None:
+    # Compiled argmax + probability blend for the 5-class branch: one
+    # machine-code call instead of ~20 Python-dispatched NumPy ops.
+    # cache=True persists the compilation on disk; the first call (made
+    # during warmup) pays it once per machine.
+    @njit(cache=True)
+    def _postprocess5(p):
+        idx = 0
+        confidence = p[0]
+        for i in range(1, 5):
+            if p[i] > confidence:
+                confidence = p[i]
+                idx = i
+        return idx, _BASE_PROBS[idx] * confidence + (1.0 - confidence) * 0.3
+else:
+    _postprocess5 = None
+
+def postprocess_prediction(prediction):
+    """Map raw model output to (probability, risk_level)"""
+    # Handle different output shapes
+    if prediction.shape[1] == 5:
+        # Multi-class classification (5 classes): blend the predicted
+        # class's base probability with its confidence
+        if _postprocess5 is not None:
+            idx, probability = _postprocess5(prediction[0])
+            return float(probability), _RISK_LEVELS[idx]
+        idx = int(prediction[0].argmax())
+        confidence = float(prediction[0, idx])
+        probability = float(_BASE_PROBS[idx]) * confidence + (1 - confidence) * 0.3
+        return probability, _RISK_LEVELS[idx]
+
+    # Binary or single probability output
+    probability = float(prediction[0, 0])
+    bucket = int(np.searchsorted(_BINARY_THRESHOLDS, probability, side='right'))
+    return probability, _BINARY_LEVELS[bucket]
+
+def predict_risk(features, include_details=False):
+    """End-to-end prediction for one feature dict, returning the response
+    body. Shared by the Flask handler and the FastAPI variant in
+    asgi_service.py. Raises FeatureEncodingError for unencodable
+    feature values."""
+    try:
+        input_data = preprocess_features(features)
+    except (KeyError, TypeError, ValueError) as e:
+        raise FeatureEncodingError(e) from e
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Input shape: %s", input_data.shape)
+        logger.debug("Input data: %s", input_data)
+
+    # Repeated submissions of the same features skip inference
+    cache_key = tuple(round(x, 4) for x in input_data[0].tolist())
+    with _cache_lock:
+        cached = _prediction_cache.get(cache_key)
+
+    if cached is not None:
+        probability, risk_level, prediction = cached
+    else:
+        # Make prediction (batched with any concurrent requests)
+        prediction = batched_inference(input_data)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Raw prediction output shape: %s", prediction.shape)
+            logger.debug("Raw prediction values: %s", prediction)
+
+        probability, risk_level = postprocess_prediction(prediction)
+        with _cache_lock:
+            _prediction_cache[cache_key] = (probability, risk_level, prediction)
+
+    body = {
+        'probability': float(probability),
+        'risk_level': risk_level,
+        'model': active_model_path(),
+        'features_used': list(features.keys())
+    }
+    # Raw model output is only useful when debugging, and serializing
+    # it on every response is measurable at high QPS
+    if include_details:
+        body['prediction_details'] = {
+            'output_shape': str(prediction.shape),
+            'raw_output': prediction
         }
-        smoking = smoking_map.get(smoking.lower(), 3)
-    feature_vector[9] = float(smoking)
-    
-    # Indices 10-21: Additional features (set to defaults or extract if provided)
-    # You should adjust these based on what your model was actually trained on
-    # Common additional features might include:
-    # - blood pressure values
-    # - cholesterol levels
-    # - other vitals
-    # - encoded categorical variables
-    
-    # For now, using sensible defaults
-    for i in range(10, 22):
-        feature_vector[i] = 0.0
-    
-    print(f"Preprocessed feature vector length: {len(feature_vector)}")
-    return np.array([feature_vector], dtype=np.float32)
+    return body
 
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
-        'model_loaded': model is not None,
-        'model_path': MODEL_PATH
+        'model_loaded': (model is not None or interpreter is not None
+                         or onnx_session is not None),
+        'model_path': active_model_path()
     })
 
 @app.route('/predict', methods=['POST'])
@@ -169,117 +578,109 @@ def predict():
         }
     }
     """
-    if model is None:
-        return jsonify({
+    if model is None and interpreter is None and onnx_session is None:
+        return json_response({
             'error': 'Model not loaded',
             'message': 'stroke_model.h5 could not be loaded'
-        }), 500
+        }, status=500)
     
     try:
-        data = request.get_json()
-        if not data or 'features' not in data:
-            return jsonify({
+        # orjson decodes the small request body several times faster than
+        # the stdlib json behind request.get_json(), and get_data(cache=
+        # False) skips caching the raw bytes on the request object
+        try:
+            data = orjson.loads(request.get_data(cache=False))
+        except orjson.JSONDecodeError:
+            return json_response({
+                'error': 'Invalid request',
+                'message': 'Request body must be valid JSON'
+            }, status=400)
+        if not isinstance(data, dict) or 'features' not in data:
+            return json_response({
                 'error': 'Invalid request',
                 'message': 'Request body must contain "features" object'
-            }), 400
+            }, status=400)
         
         features = data['features']
-        
-        # Preprocess features
-        input_data = preprocess_features(features)
-        
-        print(f"Input shape: {input_data.shape}")
-        print(f"Input data: {input_data}")
-        
-        # Make prediction
-        prediction = model.predict(input_data, verbose=0)
-        print(f"Raw prediction output shape: {prediction.shape}")
-        print(f"Raw prediction values: {prediction}")
-        
-        # Handle different output shapes
-        if prediction.shape[1] == 5:
-            # Multi-class classification (5 classes)
-            # Get the predicted class and its probability
-            predicted_class = int(np.argmax(prediction[0]))
-            class_probabilities = prediction[0]
-            
-            # Map class to risk level (adjust based on your training)
-            # Assuming classes 0-4 represent risk levels from lowest to highest
-            risk_mapping = {
-                0: ('very_low', 'Very Low risk', 0.1),
-                1: ('low', 'Low risk', 0.3),
-                2: ('moderate', 'Moderate risk', 0.5),
-                3: ('high', 'High risk', 0.7),
-                4: ('very_high', 'Very High risk', 0.9)
-            }
-            
-            risk_level, risk_display, probability = risk_mapping.get(predicted_class, ('moderate', 'Moderate risk', 0.5))
-            
-            # Use the confidence of the predicted class as probability
-            confidence = float(class_probabilities[predicted_class])
-            
-            # Adjust probability based on class and confidence
-            probability = probability * confidence + (1 - confidence) * 0.3
-            
-        else:
-            # Binary or single probability output
-            probability = float(prediction[0][0])
-            
-            # Determine risk level
-            if probability >= 0.7:
-                risk_level = 'high'
-                risk_display = 'High risk'
-            elif probability >= 0.4:
-                risk_level = 'moderate'
-                risk_display = 'Moderate risk'
-            else:
-                risk_level = 'low'
-                risk_display = 'Low risk'
-        
-        return jsonify({
-            'probability': float(probability),
-            'risk_level': risk_level,
-            'model': 'stroke_model.h5',
-            'features_used': list(features.keys()),
-            'prediction_details': {
-                'output_shape': str(prediction.shape),
-                'raw_output': prediction.tolist()
-            }
-        })
-        
-    except Exception as e:
-        return jsonify({
+        if not isinstance(features, dict):
+            return json_response({
+                'error': 'Invalid request',
+                'message': '"features" must be an object'
+            }, status=400)
+        body = predict_risk(features,
+                            include_details=request.args.get('debug') == '1')
+        return json_response(body)
+
+    except FeatureEncodingError as e:
+        # Unencodable feature values are a client error; keep the
+        # response short instead of stringifying the exception into it
+        logger.warning("Bad /predict input: %s", e)
+        return json_response({
+            'error': 'Invalid request',
+            'message': 'Features could not be encoded'
+        }, status=400)
+    except Exception:
+        # TF errors carry long graph context; log the traceback once and
+        # return a fixed short body rather than formatting it per response
+        logger.exception("Prediction failed")
+        return json_response({
             'error': 'Prediction failed',
-            'message': str(e)
-        }), 500
+            'message': 'Internal error during inference'
+        }, status=500)
 
 @app.route('/model/info', methods=['GET'])
 def model_info():
     """Get model information"""
+    if interpreter is not None:
+        return jsonify({
+            'model_path': TFLITE_PATH,
+            'input_shape': str(list(input_details['shape'])),
+            'output_shape': str(list(output_details['shape'])),
+            'expected_features': FEATURE_NAMES,
+            'feature_count': len(FEATURE_NAMES)
+        })
+    if onnx_session is not None:
+        return jsonify({
+            'model_path': ONNX_PATH,
+            'input_shape': str(onnx_session.get_inputs()[0].shape),
+            'output_shape': str(onnx_session.get_outputs()[0].shape),
+            'expected_features': FEATURE_NAMES,
+            'feature_count': len(FEATURE_NAMES)
+        })
     if model is None:
         return jsonify({'error': 'Model not loaded'}), 500
-    
+
     return jsonify({
-        'model_path': MODEL_PATH,
+        'model_path': keras_model_path,
         'input_shape': str(model.input_shape),
         'output_shape': str(model.output_shape),
         'expected_features': FEATURE_NAMES,
         'feature_count': len(FEATURE_NAMES)
     })
 
+# Load at import time so production serving via
+#   gunicorn -w 4 -k sync --preload --timeout 30 -b 0.0.0.0:5000 model_service:app
+# loads the model once in the master and fork()s workers that share the
+# read-only weight pages.
+MODEL_LOADED = load_model()
+
 if __name__ == '__main__':
+    # One-time handler setup; set level=logging.DEBUG to see per-request
+    # feature vectors and raw predictions.
+    logging.basicConfig(level=logging.INFO)
+
     print("=" * 60)
     print("🏥 Stroke Risk Prediction Model Service")
     print("=" * 60)
-    
-    # Load model on startup
-    if load_model():
+
+    if MODEL_LOADED:
         print("\n✓ Starting Flask server on http://localhost:5000")
         print("  - Health check: http://localhost:5000/health")
         print("  - Model info: http://localhost:5000/model/info")
         print("  - Prediction: POST http://localhost:5000/predict")
+        print("  (dev server - use gunicorn in production, see MODEL_INTEGRATION.md)")
         print("=" * 60)
-        app.run(host='0.0.0.0', port=5000, debug=True)
+        app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
     else:
         print("\n✗ Failed to load model. Please ensure stroke_model.h5 exists.")
         print("  Exiting...")